@@ -118,9 +118,10 @@ does not exist.
 """
 
 import argparse
+import collections
+import functools
 import re
-import subprocess
-import textwrap
+import sys
 
 ## Command line and configuration file parsing
 
@@ -129,9 +130,98 @@ class AngleBracketsHelpFormatter(argparse.HelpFormatter):
         default = super()._get_default_metavar_for_positional(action)
         return f'<{default}>'
 
-# Thanks mike.depalatis.net:
-cli = argparse.ArgumentParser(formatter_class=AngleBracketsHelpFormatter)
-subparsers = cli.add_subparsers(title="subcommands", description="")
+def make_cli():
+    """Returns a new top-level parser and its subcommand group."""
+    # Thanks mike.depalatis.net:
+    cli = argparse.ArgumentParser(formatter_class=AngleBracketsHelpFormatter)
+    subparsers = cli.add_subparsers(title="subcommands", description="")
+    return cli, subparsers
+
+cli, subparsers = make_cli()
+
+# Joins continuation lines of an Args: block onto the preceding argument.
+_ARGS_RE = re.compile(r"\s*\n\s{4,}")
+
+# Subcommands are registered with argparse lazily, in main(), and only when the
+# full tree is needed (help and errors).  Entries are (parent, func).
+_PENDING = []
+
+# Maps every name and alias of a subcommand of the main cli to its function,
+# so that main() can dispatch without building the full argparse tree.
+_ALIAS_TO_FUNC = {}
+
+# args is the raw body of the Args: block; see _parse_args_block().
+Spec = collections.namedtuple("Spec", "name shorthelp aliases longhelp args")
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_args_block(text):
+    """Parses the body of an Args: block into (names, kwargs) pairs.
+
+    This is kept apart from _parse_docstring() so that only subcommands that
+    are actually added to a parser pay for it.
+    """
+    args = []
+    for line in _ARGS_RE.sub(" ", text).split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        arg, arghelp = line.split(": ")
+        if arg.startswith("-"):
+            if '=' in arg:
+                kwargs = {"action": "store", "type": str}
+                (arg, atype) = arg.split('=')
+                if atype.endswith("..."):
+                    kwargs["action"] = "append"
+                    atype = atype[:-3]
+                if atype == "int":
+                    kwargs["type"] = int
+            else:
+                kwargs = {"action": "store_true"}
+        else:
+            kwargs = {"action": "store", "type": str}
+            if arg.endswith("..."):
+                kwargs = {"action": "append", "nargs": "+"}
+                arg = arg[:-3]
+        kwargs["help"] = arghelp
+        args.append((tuple(arg.split("|")), kwargs))
+    return tuple(args)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_docstring(docstr):
+    """Splits a subcommand docstring into a Spec (see _add_subcommand).
+
+    The docstring is walked once, a paragraph at a time.  Each paragraph is
+    dedented as it ends and filed as the heading, the Args: block, the
+    Aliases: line, or part of the long help.
+    """
+    head = None
+    aliases = ()
+    args = ""
+    body = []
+    paragraph = []
+    for line in docstr.strip().splitlines() + [""]:
+        if line.strip():
+            paragraph.append(line)
+            continue
+        if not paragraph:
+            continue
+        margin = min(len(x) - len(x.lstrip()) for x in paragraph)
+        text = "\n".join(x[margin:] for x in paragraph)
+        paragraph = []
+        if head is None:
+            head = text
+        elif not args and text.startswith("Args:\n"):
+            args = text[5:]
+        elif not aliases and text.startswith("Aliases:"):
+            aliases = tuple(sys.intern(x.strip()) for x in text[9:].split(","))
+        else:
+            body.append(text)
+
+    name, shorthelp = head.split(": ")
+    name = sys.intern(name)
+    return Spec(name, shorthelp, aliases, "\n\n".join(body), args)
 
 
 def _add_subcommand(parent, func):
@@ -166,61 +256,65 @@ def _add_subcommand(parent, func):
 
         Usage: subvert <paradigm> [--kill]
     """
-    docstr = func.__doc__
-    paragraphs = [textwrap.dedent(s) for s in docstr.strip().split("\n\n")]
-
-    name, shorthelp = paragraphs[0].split(": ")
-    del paragraphs[0]
-    
-    args_list = []
-    try:
-        index = [x.startswith("Args:\n") for x in paragraphs].index(True)
-        args_list = [x[5:] for x in paragraphs if x.startswith("Args:\n")]
-        del paragraphs[index]
-    except ValueError:
-        pass
-
-    aliases = []
-    try:
-        index = [x.startswith("Aliases:") for x in paragraphs].index(True)
-        aliases = [x.strip() for x in paragraphs[index][9:].split(",")]
-        del paragraphs[index]
-    except ValueError:
-        pass
-
-    longhelp = "\n\n".join(paragraphs)
-
-    parser = parent.add_parser(name, help=shorthelp, description=longhelp, aliases=aliases, formatter_class=AngleBracketsHelpFormatter)
+    spec = _parse_docstring(func.__doc__)
+    parser = parent.add_parser(spec.name, help=spec.shorthelp, description=spec.longhelp, aliases=spec.aliases, formatter_class=AngleBracketsHelpFormatter)
+    _add_arguments(parser, spec, func)
+
+
+def _make_parser(func):
+    """Creates a standalone parser for one subcommand of the main cli."""
+    spec = _parse_docstring(func.__doc__)
+    parser = argparse.ArgumentParser(prog=f"{cli.prog} {spec.name}", description=spec.longhelp, formatter_class=AngleBracketsHelpFormatter)
+    _add_arguments(parser, spec, func)
+    return parser
+
+
+def _add_arguments(parser, spec, func):
+    """Adds the arguments of a subcommand's Args: block to parser."""
     parser.set_defaults(func=func)
-    if args_list:
-        args = re.sub(r"\s*\n\s{4,}", " ", args_list[0])
-        args_list = [x.strip() for x in args.split("\n")]
-        for arg, arghelp in [x.split(": ") for x in args_list if x]:
-            if arg.startswith("-"):
-                if '=' in arg:
-                    kwargs = {"action": "store", "type": "str"}
-                    (arg, atype) = arg.split('=')
-                    if atype.endswith("..."):
-                        kwargs["action"] = "append"
-                        kwargs["default"] = []
-                        atype = atype[:-3]
-                    if atype == "int":
-                        kwargs["type"] = int
-                else:
-                    kwargs = {"action": "store_true"}
-            else:
-                kwargs = {"action": "store", "type": str}
-                if arg.endswith("..."):
-                    kwargs = {"action": "append", "nargs": "+"}
-                    arg = arg[:-3]
-            kwargs["help"] = arghelp
-            parser.add_argument(*(arg.split("|")), **kwargs)
+    for names, kwargs in _parse_args_block(spec.args):
+        if names[0].startswith("-") and kwargs["action"] == "append":
+            # A fresh list per parser: the cached kwargs must not be shared.
+            kwargs = {**kwargs, "default": []}
+        parser.add_argument(*names, **kwargs)
+
+
+def _command_names(func):
+    """Returns the name and aliases of a subcommand."""
+    spec = _parse_docstring(func.__doc__)
+    return (spec.name,) + spec.aliases
+
+
+def _register_subcommands(parent):
+    """Adds every pending subcommand of parent to it."""
+    for entry in [x for x in _PENDING if x[0] is parent]:
+        _PENDING.remove(entry)
+        _add_subcommand(parent, entry[1])
 
 
 def subcommand(parent=subparsers):
-    # TODO(jonathan): parse args from doc string
+    """Declares a subcommand of parent; see _add_subcommand.
+
+    A second subcommand with the same name as one already declared on parent
+    is ignored.  Any other clash between the names and aliases of two
+    subcommands raises argparse.ArgumentError.
+    """
     def decorator(func):
-        _add_subcommand(parent, func)
+        names = _command_names(func)
+        # Maps each name and alias declared on parent to its primary name.
+        declared = vars(parent).setdefault("_declared_names", {})
+        if declared.get(names[0]) == names[0]:
+            return func
+        for name in names:
+            if name in declared or name in parent._name_parser_map:
+                raise argparse.ArgumentError(None, f"conflicting subcommand name: {name}")
+        for name in names:
+            declared[name] = names[0]
+        _PENDING.append((parent, func))
+        if parent is subparsers:
+            for name in names:
+                _ALIAS_TO_FUNC[name] = func
+        return func
     return decorator
 
 def argument(*name, **kwargs):
@@ -228,8 +322,43 @@ def argument(*name, **kwargs):
 
 ## Logging
 
+def _show(cmdline):
+    """Shows the user a command line that is about to run."""
+    print(f"$ {cmdline}", file=sys.stderr)
+
 ## Subprocess wrappers
 
+# subprocess and shlex are imported on first use, so that invocations which
+# never shell out (such as --help) don't pay to load them.
+
+def run_single(cmd, check=True, capture_output=True):
+    """Runs a single command, given as a list of arguments.
+
+    Use this when python logic needs to look at the result of one command
+    before deciding what to run next.  Otherwise, prefer run_batch().
+    """
+    import shlex
+    import subprocess
+    _show(shlex.join(cmd))
+    return subprocess.run(cmd, check=check, capture_output=capture_output, text=True)
+
+
+def run_batch(cmds, check=True, capture_output=True):
+    """Runs a sequence of commands in a single shell.
+
+    The commands are joined with "&&", so the batch stops at the first
+    command that fails.  This costs one fork/exec for the whole batch rather
+    than one per command, for example when fetching and rebasing each branch
+    in a chain:
+
+        run_batch([["git", "fetch"], ["git", "rebase", "origin/main"]])
+    """
+    import shlex
+    import subprocess
+    cmdline = " && ".join(shlex.join(cmd) for cmd in cmds)
+    _show(cmdline)
+    return subprocess.run(cmdline, shell=True, check=check, capture_output=capture_output, text=True)
+
 ## Helpers
 
 ## Commands
@@ -257,8 +386,15 @@ def foobar(args):
 
 ## main
 
-def main():
-    args = cli.parse_args()
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in _ALIAS_TO_FUNC:
+        args = _make_parser(_ALIAS_TO_FUNC[argv[0]]).parse_args(argv[1:])
+    else:
+        # Help, errors, and anything else that needs the full tree.
+        _register_subcommands(subparsers)
+        args = cli.parse_args(argv)
     print(f"args={args!r}")
     if not args.func:
         cli.print_help()
@@ -1,9 +1,15 @@
 #!/usr/bin/python3
 
+import argparse
+import contextlib
+import io
+import subprocess
 import unittest
 import geet
 
-@geet.subcommand()
+cli, subparsers = geet.make_cli()
+
+@geet.subcommand(subparsers)
 def testing(args):
     """testing: testing the cli api
 
@@ -16,7 +22,7 @@ def testing(args):
     """
     print(f"{args!r}")
 
-@geet.subcommand()
+@geet.subcommand(subparsers)
 def foobar(args):
     """foobar: foo the bars
 
@@ -26,6 +32,144 @@ def foobar(args):
 
 class GeetCliTest(unittest.TestCase):
 
+    def test_parse_docstring(self):
+        spec = geet._parse_docstring(testing.__doc__)
+        self.assertEqual(spec.name, 'testing')
+        self.assertEqual(spec.shorthelp, 'testing the cli api')
+        self.assertEqual(spec.aliases, ('t', 'test'))
+        self.assertEqual(spec.longhelp, '')
+        self.assertEqual([x[0] for x in geet._parse_args_block(spec.args)],
+                         [('branch',), ('files',), ('-k', '--kill')])
+        self.assertIs(geet._parse_docstring(testing.__doc__), spec)
+
+        spec = geet._parse_docstring(foobar.__doc__)
+        self.assertEqual(spec.name, 'foobar')
+        self.assertEqual(spec.aliases, ())
+        self.assertEqual(spec.longhelp, 'foo foo bar bar')
+        self.assertEqual(spec.args, '')
+
+    def test_parse_flag_arguments(self):
+        spec = geet._parse_docstring("""flags: flag types
+
+        Args:
+           -c|--comment=string: a string flag that
+              continues on the next line
+           -n|--num=int...: a repeated int flag
+        """)
+        (names, kwargs), (_, num_kwargs) = geet._parse_args_block(spec.args)
+        self.assertEqual(names, ('-c', '--comment'))
+        self.assertEqual(kwargs, {'action': 'store', 'type': str,
+                                  'help': 'a string flag that continues on the next line'})
+        self.assertEqual(num_kwargs['action'], 'append')
+        self.assertIs(num_kwargs['type'], int)
+
+    def test_repeated_flag_default(self):
+        def cmd(args):
+            """cmd: a command
+
+            Args:
+               -c|--comment=string...: comments
+            """
+        geet._make_parser(cmd).parse_args([]).comment.append('leak')
+        self.assertEqual(geet._make_parser(cmd).parse_args([]).comment, [])
+        self.assertEqual(geet._make_parser(cmd).parse_args(['-c', 'x', '-c', 'y']).comment, ['x', 'y'])
+
+    def test_subcommand(self):
+        argv = ['t', 'main', 'a', 'b', '-k']
+        geet._register_subcommands(subparsers)
+        args = cli.parse_args(argv)
+        self.assertIs(args.func, testing)
+        self.assertEqual(args.branch, 'main')
+        self.assertEqual(args.files, [['a', 'b']])
+        self.assertTrue(args.kill)
+
+    def test_command_names(self):
+        def zip_(args):
+            """zip: zips things
+
+            body para
+            Aliases: z
+            """
+        self.assertEqual(geet._command_names(testing), ('testing', 't', 'test'))
+        self.assertEqual(geet._command_names(zip_), ('zip',))
+
+    def test_fast_path_parser(self):
+        self.assertIs(geet._ALIAS_TO_FUNC['t'], geet.testing)
+        self.assertNotIn(testing, geet._ALIAS_TO_FUNC.values())
+        args = geet._make_parser(geet.testing).parse_args(['main', 'a'])
+        self.assertIs(args.func, geet.testing)
+        self.assertEqual(args.files, [['a']])
+        self.assertFalse(args.kill)
+
+    def test_main_fast_path(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            geet.main(['t', 'main', 'a', '-k'])
+        self.assertIn("branch='main', files=[['a']], kill=True", out.getvalue())
+
+    def test_main_full_cli(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), self.assertRaises(SystemExit) as cm:
+            geet.main(['-h'])
+        self.assertEqual(cm.exception.code, 0)
+        self.assertIn('testing (t, test)', out.getvalue())
+        self.assertIn('foobar', out.getvalue())
+
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as cm:
+            geet.main(['nosuchcommand'])
+        self.assertEqual(cm.exception.code, 2)
+
+    def test_duplicate_subcommand(self):
+        cli, subparsers = geet.make_cli()
+        geet.subcommand(subparsers)(foobar)
+
+        @geet.subcommand(subparsers)
+        def duplicate(args):
+            """foobar: foo the bars again"""
+
+        geet._register_subcommands(subparsers)
+        self.assertIs(cli.parse_args(['foobar']).func, foobar)
+
+    def test_conflicting_alias(self):
+        cli, subparsers = geet.make_cli()
+        geet.subcommand(subparsers)(testing)
+
+        def other(args):
+            """other: another command
+
+            Aliases: o, t
+            """
+        with self.assertRaises(argparse.ArgumentError):
+            geet.subcommand(subparsers)(other)
+        geet._register_subcommands(subparsers)
+        self.assertIs(cli.parse_args(['t', 'main', 'a']).func, testing)
+        self.assertNotIn('o', subparsers._name_parser_map)
+
+    def test_run_batch(self):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            result = geet.run_batch([['echo', 'a  b'], ['echo', "c'd"]])
+        self.assertEqual(result.stdout, "a  b\nc'd\n")
+        self.assertEqual(err.getvalue(), "$ echo 'a  b' && echo 'c'\"'\"'d'\n")
+
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            result = geet.run_batch([['false'], ['echo', 'x']], check=False)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, '')
+        self.assertEqual(err.getvalue(), "$ false && echo x\n")
+
+    def test_run_single(self):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            result = geet.run_single(['echo', 'a  b'])
+        self.assertEqual(result.stdout, "a  b\n")
+        self.assertEqual(err.getvalue(), "$ echo 'a  b'\n")
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(subprocess.CalledProcessError):
+                geet.run_single(['false'])
+
     def test_upper(self):
         self.assertEqual('foo'.upper(), 'FOO')
 